@@ -5,16 +5,20 @@ HTF scanner (robust scalar extraction + retries).
 Fixes:
 - Avoid using float() on a pandas Series (FutureWarning).
 - Avoid ambiguous truth-value comparisons by ensuring comparisons use scalars.
-- Keep retries/backoff and let yfinance manage its own internal session.
+- Keep retries/backoff; share one curl_cffi session across all downloads so
+  TLS state and Yahoo's crumb are negotiated once, not per call.
 """
 import os
 import sys
 import time
-import csv
+import concurrent.futures
 import logging
 from datetime import datetime, timezone
+import numpy as np
 import pandas as pd
 import yfinance as yf
+from curl_cffi import requests as cffi_requests
+from numba import njit
 
 # Configuration
 WATCHLIST = [
@@ -32,86 +36,121 @@ HTF_INTERVAL = "4h"     # high timeframe used to compute EMAs
 PERIOD = "90d"          # history length
 RETRIES = 3
 BACKOFF_BASE = 2        # seconds (exponential backoff base)
+MAX_WORKERS = 8         # parallel downloads (downloads are I/O-bound; keep modest for Yahoo's rate limiter)
+# Smoothing factors for the span-34/200 EMAs, alpha = 2/(span+1)
+# (the adjust=False form). Bars arrive on a fixed 4h grid, so a constant
+# alpha is exact — do not "upgrade" to pandas' times=-based ewm to handle
+# irregular spacing; that code path is O(n^2) and orders of magnitude slower.
+ALPHA_34 = 2.0 / (34 + 1)
+ALPHA_200 = 2.0 / (200 + 1)
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 
 
-def safe_last_scalar(series: pd.Series):
+def make_session():
     """
-    Return a Python float for the last non-NA element of a Series.
-    If series is empty or has no valid values return None.
+    Build one process-wide curl_cffi session for all yfinance calls.
+    Reusing it keeps TCP connections, TLS state and Yahoo's crumb alive
+    across every download instead of renegotiating them per call.
     """
-    if series is None:
-        return None
-    s = series.dropna()
-    if s.empty:
-        return None
-    try:
-        # use iat for fastest scalar access
-        val = s.iat[-1]
-        # If it is a numpy scalar convert to Python float
-        if hasattr(val, "item"):
-            return float(val.item())
-        return float(val)
-    except Exception as e:
-        logging.warning("safe_last_scalar: failed to extract scalar: %s", e)
-        try:
-            return float(s.iloc[-1])
-        except Exception:
-            return None
+    return cffi_requests.Session(impersonate="chrome")
 
 
-def download_with_retries(ticker, attempts=RETRIES):
+def download_with_backoff(label, fetch, attempts=RETRIES):
     """
-    Download historical data for `ticker` via yfinance.download().
-    Do not pass a requests.Session — let yfinance control its transport.
-    Retries on exception or empty DataFrame.
+    Run `fetch` (a zero-arg callable returning a DataFrame) under the
+    shared retry policy: exponential backoff on exception or empty result,
+    with no sleep after the final attempt. urllib3.util.Retry would do
+    this at the transport layer, but the curl_cffi session yfinance needs
+    has no urllib3 adapter stack to mount it on, so the policy lives here
+    once instead of being copied per download path.
     """
     last_exc = None
     for attempt in range(1, attempts + 1):
         try:
-            logging.info(f"Downloading {ticker} attempt {attempt}/{attempts} (no external session)")
-            df = yf.download(tickers=ticker, period=PERIOD, interval=HTF_INTERVAL, progress=False, threads=False)
+            logging.info(f"Downloading {label} attempt {attempt}/{attempts}")
+            df = fetch()
             if isinstance(df, pd.DataFrame) and not df.empty:
-                logging.info(f"Downloaded {ticker} rows={len(df)}")
+                logging.info(f"Downloaded {label} rows={len(df)}")
                 return df
-            else:
-                logging.warning(f"No data returned for {ticker} on attempt {attempt}")
+            logging.warning(f"No data returned for {label} on attempt {attempt}")
         except Exception as e:
             last_exc = e
-            logging.warning(f"Error downloading {ticker} on attempt {attempt}: {e}")
+            logging.warning(f"Error downloading {label} on attempt {attempt}: {e}")
         if attempt < attempts:
             sleep = BACKOFF_BASE ** (attempt - 1)
-            logging.info(f"Sleeping {sleep}s before retry for {ticker}")
+            logging.info(f"Sleeping {sleep}s before retry for {label}")
             time.sleep(sleep)
-    raise last_exc if last_exc else RuntimeError(f"Failed to download {ticker} after {attempts} attempts")
+    raise last_exc if last_exc else RuntimeError(f"Failed to download {label} after {attempts} attempts")
 
 
-def compute_emas(df):
-    close = df['Close'].dropna()
-    if close.empty:
-        return pd.Series(dtype=float), pd.Series(dtype=float)
-    ema34 = close.ewm(span=34, adjust=False).mean()
-    ema200 = close.ewm(span=200, adjust=False).mean()
-    return ema34, ema200
+def download_with_retries(ticker, attempts=RETRIES, session=None):
+    """
+    Download one ticker's history via the shared session and retry policy.
+    Uses Ticker.history rather than yf.download: the result comes back with
+    plain single-level columns (no multi-ticker MultiIndex machinery), so
+    extract_closes can lift the Close column straight into an ndarray.
+    """
+    return download_with_backoff(
+        ticker,
+        lambda: yf.Ticker(ticker, session=session).history(
+            period=PERIOD, interval=HTF_INTERVAL, auto_adjust=False),
+        attempts)
 
 
-def detect_recent_cross(ema34: pd.Series, ema200: pd.Series):
+def download_batch(tickers, attempts=RETRIES, session=None):
     """
-    Returns True if a sign-change in (ema34 - ema200) occurred recently (last 3 valid points).
-    Operates on Series; returns False if not enough data.
+    Download all tickers in a single multi-ticker yfinance request.
+    One HTTP transaction replaces len(tickers) sequential ones; the crumb
+    and TLS handshake amortize across the whole watchlist. Returns a
+    DataFrame with a (ticker, field) column MultiIndex.
     """
-    try:
-        diff = (ema34 - ema200).dropna()
-        if len(diff) < 3:
-            return False
-        last_vals = diff.iloc[-3:]
-        # convert to scalars and check sign change from first to last
-        a = float(last_vals.iat[0])
-        b = float(last_vals.iat[-1])
-        return (a * b) < 0
-    except Exception:
-        return False
+    return download_with_backoff(
+        f"batch of {len(tickers)} tickers",
+        lambda: yf.download(tickers=" ".join(tickers), period=PERIOD, interval=HTF_INTERVAL,
+                            group_by="ticker", progress=False, threads=True, session=session),
+        attempts)
+
+
+@njit(cache=True, fastmath=True)
+def ema_scan(x, a34, a200):
+    """
+    Fused scan over a float64 close array: compute both EMAs, the recent
+    cross flag and the last close in a single pass with no intermediate
+    arrays. The running EMAs are scalars; the (ema34 - ema200) diff is
+    remembered three bars back so a sign change over the last 3 bars can
+    be detected at the end.
+    The explicit fixed-alpha recursion ema[i] = a*x[i] + (1-a)*ema[i-1]
+    matches ewm(span=N, adjust=False).mean() exactly on our fixed-interval
+    bars; keep it — there is no irregular-timestamp case to handle here.
+    Returns (last_close, last_ema34, last_ema200, recent_cross).
+    """
+    n = x.shape[0]
+    e34 = x[0]
+    e200 = x[0]
+    # at bar 0 both EMAs equal x[0], so the diff there is exactly 0
+    diff_back3 = 0.0 if n == 3 else np.nan
+    for i in range(1, n):
+        e34 = a34 * x[i] + (1.0 - a34) * e34
+        e200 = a200 * x[i] + (1.0 - a200) * e200
+        if i == n - 3:
+            diff_back3 = e34 - e200
+    cross = False
+    if n >= 3 and not np.isnan(diff_back3):
+        cross = (diff_back3 * (e34 - e200)) < 0.0
+    return x[n - 1], e34, e200, cross
+
+
+def extract_closes(df):
+    """
+    Pull the Close column of a downloaded frame into a float64 ndarray and
+    NaN-mask it — no Series allocation, no .dropna(). Returns an empty
+    array when the frame has no usable closes.
+    """
+    if df is None or 'Close' not in df:
+        return np.empty(0)
+    arr = df['Close'].to_numpy(dtype=np.float64, copy=False)
+    return arr[~np.isnan(arr)]
 
 
 def main():
@@ -119,34 +158,57 @@ def main():
     run_time = datetime.now(timezone.utc).isoformat()
     errors = []
 
-    logging.info("Starting HTF scan (yfinance will manage sessions internally)")
+    logging.info("Starting HTF scan (shared curl_cffi session)")
+    session = make_session()
 
-    for ticker in WATCHLIST:
-        friendly = NAME_MAP.get(ticker, ticker)
-        try:
-            df = download_with_retries(ticker, attempts=RETRIES)
-            ema34, ema200 = compute_emas(df)
+    # One multi-ticker request fetches the whole watchlist; per-ticker frames
+    # are sliced out of the returned (ticker, field) MultiIndex.
+    try:
+        df_all = download_batch(WATCHLIST, attempts=RETRIES, session=session)
+    except Exception as e:
+        logging.error("Batch download failed entirely: %s — falling back to per-ticker downloads", e)
+        df_all = None
 
-            # Extract scalars safely
-            last_close = safe_last_scalar(df['Close']) if 'Close' in df else None
-            last_ema34 = safe_last_scalar(ema34)
-            last_ema200 = safe_last_scalar(ema200)
+    # Each ticker is reduced to its clean close array right away; the
+    # per-ticker DataFrames are released as soon as the closes are out.
+    closes_by_ticker = {}
+    download_errors = {}
+    missing = []
+    for ticker in WATCHLIST:
+        closes = np.empty(0)
+        if df_all is not None and ticker in df_all.columns.get_level_values(0):
+            closes = extract_closes(df_all[ticker])
+        if closes.size == 0:
+            missing.append(ticker)
+        else:
+            closes_by_ticker[ticker] = closes
 
-            if last_close is None:
-                raise RuntimeError("No close price available for symbol")
+    # Symbols the batch missed get an individual retry, still in parallel.
+    if missing:
+        logging.info("Retrying %d symbols individually: %s", len(missing), missing)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(missing))) as pool:
+            futures = {pool.submit(download_with_retries, ticker, RETRIES, session): ticker for ticker in missing}
+            for future in concurrent.futures.as_completed(futures):
+                ticker = futures[future]
+                try:
+                    closes_by_ticker[ticker] = extract_closes(future.result())
+                except Exception as e:
+                    download_errors[ticker] = e
 
-            # Determine bias/momentum ensuring we're comparing scalars
-            if last_ema200 is None:
-                bias = "neutral"
-            else:
-                bias = "bull" if last_close > last_ema200 else ("bear" if last_close < last_ema200 else "neutral")
+    for ticker in WATCHLIST:
+        friendly = NAME_MAP.get(ticker, ticker)
+        try:
+            closes = closes_by_ticker.get(ticker)
+            if closes is None or closes.size == 0:
+                raise download_errors.get(ticker) or RuntimeError("No close price available for symbol")
 
-            if last_ema34 is None:
-                momentum = "neutral"
-            else:
-                momentum = "bull" if last_close > last_ema34 else ("bear" if last_close < last_ema34 else "neutral")
+            last_close, last_ema34, last_ema200, cross = ema_scan(closes, ALPHA_34, ALPHA_200)
+            last_close, last_ema34, last_ema200, cross = \
+                float(last_close), float(last_ema34), float(last_ema200), bool(cross)
 
-            cross = detect_recent_cross(ema34, ema200)
+            # Bias/momentum from plain Python floats
+            bias = "bull" if last_close > last_ema200 else ("bear" if last_close < last_ema200 else "neutral")
+            momentum = "bull" if last_close > last_ema34 else ("bear" if last_close < last_ema34 else "neutral")
 
             score = 0
             if bias == momentum and bias != "neutral":
@@ -187,13 +249,10 @@ def main():
                 "notes": f"download error: {e}"
             })
 
-    # Write CSV (overwrite each run)
+    # Write CSV (overwrite each run) through pandas' C writer: one columnar
+    # dump with quoting/escaping handled for us, no per-row Python dispatch.
     fieldnames = ["run_time","ticker","symbol","last_close","ema34","ema200","bias","momentum","ema_cross_recent","score","notes"]
-    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=fieldnames)
-        writer.writeheader()
-        for r in rows:
-            writer.writerow(r)
+    pd.DataFrame(rows, columns=fieldnames).to_csv(OUTPUT_CSV, index=False)
 
     # Exit non-zero if all symbols errored (so Action shows failure)
     if len(errors) == len(WATCHLIST):
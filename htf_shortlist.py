@@ -1,5 +1,6 @@
 from fastapi import FastAPI
-import json, os
+from fastapi.responses import FileResponse
+import os
 
 app = FastAPI(title="Subsonic 4H Scanner")
 
@@ -7,6 +8,6 @@ app = FastAPI(title="Subsonic 4H Scanner")
 def shortlist():
     if not os.path.exists("scan_results.csv"):
         return {"error": "No scan results yet"}
-    with open("scan_results.csv") as f:
-        data = f.read()
-    return {"message": "4H Scanner results", "data": data}
+    # Serve the file as-is: Starlette streams it in chunks, so no
+    # whole-file read into memory and no JSON-escaping pass over the body.
+    return FileResponse("scan_results.csv", media_type="text/csv")
@@ -1,18 +1,145 @@
 import numpy as np
-from datetime import datetime, time
+from datetime import datetime
+from functools import lru_cache
+from numba import njit
+
+# London session window (07:00–11:00 UTC inclusive) as minutes-of-day,
+# so the per-bar filter is a single integer range check.
+LONDON_OPEN_MIN = 7 * 60
+LONDON_CLOSE_MIN = 11 * 60
+
+@lru_cache(maxsize=8192)
+def _parse_iso(s):
+    """Memoized datetime.fromisoformat — bar timestamps repeat heavily when
+    frames are iterated as dicts, so repeated strings parse once."""
+    return datetime.fromisoformat(s)
 
 def is_london_session(dt):
     """Check if datetime is within London session (07:00–11:00 UTC)."""
     if isinstance(dt, str):
-        dt = datetime.fromisoformat(dt)
-    return time(7, 0) <= dt.time() <= time(11, 0)
+        dt = _parse_iso(dt)
+    return LONDON_OPEN_MIN <= dt.hour * 60 + dt.minute <= LONDON_CLOSE_MIN
 
 def body_size(open_, close):
     return abs(close - open_)
 
-def average_body(candles, n=14):
-    bodies = [body_size(c['Open'], c['Close']) for c in candles[-n:]]
-    return float(np.mean(bodies)) if bodies else 0.0
+def candles_to_arrays(candles):
+    """Convert a list of candle dicts (AoS) into open/close float64 arrays (SoA)."""
+    n = len(candles)
+    open_arr = np.empty(n, dtype=np.float64)
+    close_arr = np.empty(n, dtype=np.float64)
+    for i, c in enumerate(candles):
+        open_arr[i] = c['Open']
+        close_arr[i] = c['Close']
+    return open_arr, close_arr
+
+def average_body(open_arr, close_arr, n=14):
+    """Mean |close - open| over the last n bars, one vectorized pass over SoA arrays."""
+    if open_arr.shape[0] == 0:
+        return 0.0
+    return float(np.abs(close_arr[-n:] - open_arr[-n:]).mean())
+
+# Fail reasons by code, as returned in subsonic_scan_all's fail_codes
+# array. Code 0 means the bar passed every gate.
+FAIL_REASONS = (
+    "Setup candidate",
+    "Not London session",
+    "Before EMA cross",
+    "First session after EMA cross",
+    "Bias not aligned",
+    "No liquidity sweep",
+    "Not enough candles for average body",
+    "Body not big enough",
+    "Wick too large in entry direction",
+    "No retest",
+    "No SL zone info",
+    "SL too tight",
+    "SL too wide",
+    "RR target not feasible",
+)
+
+@njit(cache=True)
+def subsonic_scan_all(open_, high, low, close, ema34, ema200,
+                      minutes, liquidity_sweep, retest_confirmed,
+                      can_reach_tp, entry_price, sl_zone,
+                      last_ema_cross_idx, is_long,
+                      min_sl_pips, max_sl_pips, max_entry_wick):
+    """
+    Batch form of subsonic_step_check: run every gate for every bar in one
+    compiled sweep over SoA float64/bool arrays instead of per-bar Python
+    dispatch over dicts.
+
+    minutes: bar time as minutes-of-day UTC (int array).
+    sl_zone: NaN where the bar has no SL zone info.
+    max_entry_wick: pass a negative value to use the 0.1 * avg_body default.
+
+    Returns (candidates, fail_codes): a bool mask of setup candidates and
+    an int8 array of FAIL_REASONS indices (0 where candidate). Map codes
+    back to strings only in the reporting layer.
+    """
+    n = close.shape[0]
+    candidates = np.zeros(n, dtype=np.bool_)
+    fail_codes = np.zeros(n, dtype=np.int8)
+    # Rolling sum of the previous 14 bodies, updated incrementally through
+    # a ring buffer: O(1) per bar instead of re-summing the window.
+    bodies = np.zeros(14)
+    body_sum = 0.0
+    for i in range(n):
+        if i > 0:
+            b = abs(close[i - 1] - open_[i - 1])
+            j = (i - 1) % 14
+            body_sum += b - bodies[j]
+            bodies[j] = b
+        if minutes[i] < LONDON_OPEN_MIN or minutes[i] > LONDON_CLOSE_MIN:
+            fail_codes[i] = 1
+            continue
+        if i <= last_ema_cross_idx:
+            fail_codes[i] = 2
+            continue
+        if i - last_ema_cross_idx == 1:
+            fail_codes[i] = 3
+            continue
+        if is_long:
+            aligned = close[i] > ema200[i] and ema34[i] > ema200[i]
+        else:
+            aligned = close[i] < ema200[i] and ema34[i] < ema200[i]
+        if not aligned:
+            fail_codes[i] = 4
+            continue
+        if not liquidity_sweep[i]:
+            fail_codes[i] = 5
+            continue
+        if i < 14:
+            fail_codes[i] = 6
+            continue
+        avg_body = body_sum / 14.0
+        bsize = abs(close[i] - open_[i])
+        if bsize < avg_body:
+            fail_codes[i] = 7
+            continue
+        wick = (high[i] - close[i]) if is_long else (close[i] - low[i])
+        wick_limit = max_entry_wick if max_entry_wick >= 0.0 else 0.1 * avg_body
+        if wick > wick_limit:
+            fail_codes[i] = 8
+            continue
+        if not retest_confirmed[i]:
+            fail_codes[i] = 9
+            continue
+        if np.isnan(sl_zone[i]):
+            fail_codes[i] = 10
+            continue
+        sl_distance = abs(entry_price[i] - sl_zone[i])
+        if sl_distance < min_sl_pips:
+            fail_codes[i] = 11
+            continue
+        if sl_distance > max_sl_pips:
+            fail_codes[i] = 12
+            continue
+        if not can_reach_tp[i]:
+            fail_codes[i] = 13
+            continue
+        candidates[i] = True
+    return candidates, fail_codes
 
 def subsonic_step_check(bar, last_ema_cross_idx, current_idx, candles, params):
     """
@@ -22,6 +149,9 @@ def subsonic_step_check(bar, last_ema_cross_idx, current_idx, candles, params):
     candles: list of previous bars (for averages, sweeps, etc)
     params: dict of thresholds/settings for your system
     Returns: (is_candidate, fail_reason, details_dict)
+
+    Per-bar convenience form; backtests over whole series should call
+    subsonic_scan_all, which runs the same gates as one compiled sweep.
     """
 
     dt = bar['Datetime']
@@ -51,7 +181,10 @@ def subsonic_step_check(bar, last_ema_cross_idx, current_idx, candles, params):
     # 5. Confirmation Candle
     if len(candles) < 14:
         return False, "Not enough candles for average body", {}
-    avg_body = average_body(candles, 14)
+    # Only the trailing window is lifted into arrays; callers that already
+    # hold SoA buffers can call average_body on them directly.
+    open_arr, close_arr = candles_to_arrays(candles[-14:])
+    avg_body = average_body(open_arr, close_arr, 14)
     bsize = body_size(bar['Open'], bar['Close'])
     if bsize < avg_body:
         return False, "Body not big enough", {}